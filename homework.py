@@ -1,13 +1,20 @@
 import logging
 import os
+import random
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from logging import StreamHandler
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
 
+import orjson
 import requests
-import telegram
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from exceptions import EndpointError, HomeworkStatuseError
 
@@ -20,82 +27,158 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_TIME = 600
+ERROR_RETRY_TIME = 60
+MAX_RETRY_TIME = 3600
+RETRY_JITTER = 30
+SEND_WORKERS = 5
+CHAT_SEND_INTERVAL = 1
+ERROR_CACHE_SIZE = 32
+ERROR_CACHE_TTL = 3600
 SECONDS_IN_MINUTE = 60
+STATUS_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'homework_bot.json'
+)
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+REQUEST_TIMEOUT = (5, 30)
+MAX_RETRY_AFTER = 60
+
+
+class CappedRetry(Retry):
+    """Стратегия повторов с ограниченным ожиданием по Retry-After."""
+
+    def get_retry_after(self, response):
+        """Возвращает паузу из Retry-After, не больше MAX_RETRY_AFTER."""
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+RETRY_STRATEGY = CappedRetry(
+    total=3,
+    backoff_factor=2,
+    status_forcelist=(
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    ),
+    allowed_methods=('GET',),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+SESSION = requests.Session()
+SESSION.mount(
+    'https://',
+    HTTPAdapter(
+        max_retries=RETRY_STRATEGY, pool_connections=1, pool_maxsize=2
+    )
+)
+SESSION.headers.update({'Connection': 'keep-alive'})
+CONDITIONAL_HEADERS = {}
 
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_MESSAGES = {
+    status: f'Изменился статус проверки работы "{{name}}". {verdict}'
+    for status, verdict in HOMEWORK_VERDICTS.items()
+}
 
 KEY_HOMEWORKS = 'homeworks'
 KEY_CURRENT_DATE = 'current_date'
 KEY_HOMEWORK_NAME = 'homework_name'
 KEY_STATUS = 'status'
+KEY_DATE_UPDATED = 'date_updated'
 
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат."""
+    from telegram import TelegramError
+
     try:
         bot.send_message(TELEGRAM_CHAT_ID, message)
-        logger.info(f'Сообщение "{message}" отправлено.')
-    except telegram.TelegramError as error:
-        error_message = f'Сбой при отправке сообщения в telegram: {error}'
-        logger.error(error_message)
-        raise telegram.TelegramError
+        logger.info('Сообщение "%s" отправлено.', message)
+    except TelegramError as error:
+        raise TelegramError(
+            f'Сбой при отправке сообщения в telegram: {error}'
+        ) from error
+
+
+def send_message_at(bot, message, send_time):
+    """Отправляет сообщение в Telegram чат не раньше момента send_time."""
+    time.sleep(max(0, send_time - time.monotonic()))
+    send_message(bot, message)
+
+
+def update_conditional_headers(response):
+    """Запоминает валидаторы ответа API для условного запроса."""
+    etag = response.headers.get('ETag')
+    if etag:
+        CONDITIONAL_HEADERS['If-None-Match'] = etag
+    last_modified = response.headers.get('Last-Modified')
+    if last_modified:
+        CONDITIONAL_HEADERS['If-Modified-Since'] = last_modified
 
 
 def get_api_answer(current_timestamp):
     """Делает запрос к единственному эндпоинту API-сервиса."""
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
-    logger.info(f'Подключаемся к API: {ENDPOINT}.')
+    logger.info('Подключаемся к API: %s.', ENDPOINT)
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
-    except ConnectionError as error:
-        logger.error(f'Ошибка {error} при подключения к API: {ENDPOINT}.')
-        raise ConnectionError
+        response = SESSION.get(
+            ENDPOINT,
+            headers={**HEADERS, **CONDITIONAL_HEADERS},
+            params=params,
+            timeout=REQUEST_TIMEOUT
+        )
+    except requests.RequestException as error:
+        raise ConnectionError(
+            f'Ошибка {type(error).__name__} при подключении к API: '
+            f'{ENDPOINT}.'
+        ) from error
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        return {KEY_HOMEWORKS: [], KEY_CURRENT_DATE: timestamp}
     if response.status_code != HTTPStatus.OK:
-        logger.error(
-            f'Сбой в работе программы: Эндпоинт {ENDPOINT} недоступен.\n'
+        raise EndpointError(
+            f'Эндпоинт {ENDPOINT} недоступен.\n'
             f'Код ответа API: {response.status_code}.\n'
-            f'Параметры запроса: {params}.\n'
-            f'Текст ответа API: {response.text}.'
+            f'Параметры запроса: {params}.'
         )
-        raise EndpointError
     try:
-        return response.json()
-    except ValueError:
-        logger.error('Ошибка преобразования ответа API из формата json')
-        raise ValueError
+        answer = orjson.loads(response.content)
+    except orjson.JSONDecodeError as error:
+        raise ValueError(
+            f'Ошибка преобразования ответа API из формата json: {error}'
+        ) from error
+    update_conditional_headers(response)
+    return answer
 
 
 def check_response(response):
     """Проверяет ответ API на корректность."""
-    logger.info(f'Проверяем ответ API: {ENDPOINT}.')
-    if not isinstance(response, dict):
-        logger.error('Тип данных ответа API должен быть словарь.')
-        raise TypeError
-    if KEY_HOMEWORKS not in response:
-        logger.error(
-            'Сбой в работе программы: Ключ словаря ответа API '
-            f' {KEY_HOMEWORKS} неверен.'
-        )
-        raise KeyError
-    homeworks = response.get(KEY_HOMEWORKS)
-    if KEY_CURRENT_DATE not in response:
-        logger.error(
-            'Сбой в работе программы: Ключ словаря ответа API '
-            f'{KEY_CURRENT_DATE} неверен.'
-        )
-        raise KeyError
+    logger.info('Проверяем ответ API: %s.', ENDPOINT)
+    try:
+        homeworks = response[KEY_HOMEWORKS]
+        response[KEY_CURRENT_DATE]
+    except TypeError as error:
+        raise TypeError(
+            'Тип данных ответа API должен быть словарь.'
+        ) from error
+    except KeyError as error:
+        raise KeyError(
+            f'Ключ словаря ответа API {error.args[0]} неверен.'
+        ) from error
     if not isinstance(homeworks, list):
-        logger.error(
+        raise TypeError(
             'Домашние работы в ответе API должны быть упакованы в список.'
         )
-        raise TypeError
     return homeworks
 
 
@@ -103,79 +186,225 @@ def parse_status(homework):
     """Извлекает из ответа API информацию о конкретной домашней работе.
     И статус этой работы.
     """
-    if not isinstance(homework, dict):
-        logger.error('Тип данных информации о работе должен быть словарь.')
-        raise TypeError
-    if KEY_HOMEWORK_NAME not in homework:
-        logger.error(
-            'Сбой в работе программы: Ключ словаря ответа API '
-            f'{KEY_HOMEWORK_NAME} неверен.'
-        )
-        raise KeyError
-    if KEY_STATUS not in homework:
-        logger.error(
-            f'Сбой в работе программы: Ключ словаря ответа API {KEY_STATUS} '
-            'неверен.'
-        )
-        raise KeyError
-    homework_name = homework.get(KEY_HOMEWORK_NAME)
-    homework_status = homework.get(KEY_STATUS)
-    if homework_status not in HOMEWORK_VERDICTS:
-        logger.error(
-            'Сбой в работе программы: в ответе API обнаружен '
-            'недокументированный статус домашней работы.'
+    try:
+        homework_name = homework[KEY_HOMEWORK_NAME]
+        homework_status = homework[KEY_STATUS]
+    except TypeError as error:
+        raise TypeError(
+            'Тип данных информации о работе должен быть словарь.'
+        ) from error
+    except KeyError as error:
+        raise KeyError(
+            f'Ключ словаря ответа API {error.args[0]} неверен.'
+        ) from error
+    try:
+        message = STATUS_MESSAGES[homework_status]
+    except KeyError as error:
+        raise HomeworkStatuseError(
+            'В ответе API обнаружен недокументированный статус домашней '
+            f'работы: {homework_status}.'
+        ) from error
+    return message.format(name=homework_name)
+
+
+def get_status_updates(homeworks, sent_updates):
+    """Проверяет работы и отбирает обновления, о которых ещё не сообщалось.
+    Обновление определяется по дате изменения работы, поэтому повторный
+    переход в тот же статус тоже отправляется.
+    Возвращает кортежи из названия работы, даты изменения и сообщения.
+    """
+    updates = []
+    for homework in homeworks:
+        message = parse_status(homework)
+        homework_name = homework[KEY_HOMEWORK_NAME]
+        date_updated = homework.get(KEY_DATE_UPDATED)
+        if (
+            date_updated is not None
+            and sent_updates.get(homework_name) == date_updated
+        ):
+            continue
+        updates.append((homework_name, date_updated, message))
+    return updates
+
+
+def load_sent_updates():
+    """Загружает из кэша даты изменения работ, о которых уже сообщалось."""
+    try:
+        with open(STATUS_CACHE_PATH, 'rb') as file:
+            sent_updates = orjson.loads(file.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    if not isinstance(sent_updates, dict):
+        return {}
+    return sent_updates
+
+
+def save_sent_updates(sent_updates):
+    """Атомарно сохраняет в кэш даты изменения отправленных работ."""
+    os.makedirs(os.path.dirname(STATUS_CACHE_PATH), exist_ok=True)
+    temp_path = f'{STATUS_CACHE_PATH}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(orjson.dumps(sent_updates))
+    os.replace(temp_path, STATUS_CACHE_PATH)
+
+
+def send_updates(executor, bot, updates, sent_updates):
+    """Отправляет сообщения об обновлениях работ.
+    Все сообщения идут в один чат, поэтому отправки стартуют по порядку
+    с интервалом CHAT_SEND_INTERVAL, как того требует лимит Telegram
+    для чата. Даты доставленных обновлений сохраняются в sent_updates,
+    даже если часть отправок не удалась; затем первая ошибка пробрасывается.
+    """
+    start_time = time.monotonic()
+    sendings = [
+        (
+            homework_name,
+            date_updated,
+            executor.submit(
+                send_message_at, bot, message,
+                start_time + index * CHAT_SEND_INTERVAL
+            )
         )
-        raise HomeworkStatuseError
-    verdict = HOMEWORK_VERDICTS.get(homework_status)
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+        for index, (homework_name, date_updated, message)
+        in enumerate(updates)
+    ]
+    errors = []
+    for homework_name, date_updated, future in sendings:
+        error = future.exception()
+        if error is None:
+            sent_updates[homework_name] = date_updated
+        else:
+            errors.append(error)
+    save_sent_updates(sent_updates)
+    if errors:
+        raise errors[0]
+
+
+def process_updates(bot, executor, current_timestamp, sent_updates):
+    """Опрашивает API и отправляет сообщения о новых обновлениях работ.
+    Возвращает метку времени для следующего запроса. При любом сбое
+    валидаторы условного запроса сбрасываются, чтобы следующий запрос
+    не получил 304 и обновления не потерялись.
+    """
+    try:
+        response = get_api_answer(current_timestamp)
+        updates = get_status_updates(check_response(response), sent_updates)
+        if not updates:
+            logger.info('Обновлений нет')
+        else:
+            send_updates(executor, bot, updates, sent_updates)
+    except Exception:
+        CONDITIONAL_HEADERS.clear()
+        raise
+    return response.get(KEY_CURRENT_DATE)
+
+
+def report_error(bot, error, recent_errors):
+    """Логирует сбой и сообщает о нём в Telegram.
+    Повторы сбоя из recent_errors в Telegram не отправляются,
+    а сбой самой отправки только логируется.
+    """
+    from telegram import TelegramError
+
+    error_message = f'Сбой в работе программы: {error}'
+    if error.__cause__ is None:
+        logger.error(error_message)
+    else:
+        logger.error('%s Причина: %s', error_message, error.__cause__)
+    if error_message in recent_errors:
+        return
+    try:
+        send_message(bot, error_message)
+    except TelegramError as send_error:
+        logger.error(send_error)
+    else:
+        recent_errors[error_message] = True
+
+
+def get_retry_time(failures):
+    """Возвращает паузу перед следующим запросом к API.
+    После успешного запроса это RETRY_TIME, после сбоев пауза начинается
+    с ERROR_RETRY_TIME и удваивается до MAX_RETRY_TIME.
+    """
+    if not failures:
+        return RETRY_TIME
+    return (
+        min(ERROR_RETRY_TIME * 2 ** (failures - 1), MAX_RETRY_TIME)
+        + random.uniform(0, RETRY_JITTER)
+    )
 
 
 def check_tokens():
     """Проверяет доступность переменных окружения."""
-    if all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID]):
-        return True
+    tokens = (
+        ('PRACTICUM_TOKEN', PRACTICUM_TOKEN),
+        ('TELEGRAM_TOKEN', TELEGRAM_TOKEN),
+        ('TELEGRAM_CHAT_ID', TELEGRAM_CHAT_ID),
+    )
+    missing_tokens = [name for name, value in tokens if not value]
+    if missing_tokens:
+        logger.critical(
+            'Отсутствуют обязательные переменные окружения: %s.',
+            ', '.join(missing_tokens)
+        )
+        return False
+    return True
+
+
+def configure_logging():
+    """Настраивает вывод логов в stdout через очередь.
+    Повторный вызов не добавляет обработчики.
+    """
+    if logger.handlers:
+        return None
+    formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - модуль: %(module)s - функция: '
+        '%(funcName)s - номер строки: %(lineno)d - %(message)s'
+    )
+    handler = StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    log_queue = Queue()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
 
 
 def main():
     """Основная логика работы бота."""
     if not check_tokens():
-        logger.critical(
-            'Отсутствует обязательная переменная окружения!\n'
-            'Программа принудительно остановлена.'
-        )
+        logger.critical('Программа принудительно остановлена.')
         exit()
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    from telegram import Bot
+    from telegram.utils.request import Request
+
+    bot = Bot(
+        token=TELEGRAM_TOKEN, request=Request(con_pool_size=SEND_WORKERS)
+    )
+    executor = ThreadPoolExecutor(max_workers=SEND_WORKERS)
     current_timestamp = int(time.time())
-    LAST_ERROR_MESSAGE = ''
+    recent_errors = TTLCache(maxsize=ERROR_CACHE_SIZE, ttl=ERROR_CACHE_TTL)
+    failures = 0
+    sent_updates = load_sent_updates()
 
     while True:
         try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if not homeworks:
-                logger.info('Обновлений нет')
-            else:
-                for homework in homeworks:
-                    message = parse_status(homework)
-                    send_message(bot, message)
-            current_timestamp = response.get(KEY_CURRENT_DATE)
+            current_timestamp = process_updates(
+                bot, executor, current_timestamp, sent_updates
+            )
+            failures = 0
         except Exception as error:
-            error_message = f'Сбой в работе программы: {error}'
-            if error_message != LAST_ERROR_MESSAGE:
-                send_message(bot, error_message)
-                LAST_ERROR_MESSAGE = error_message
-            logger.error(error_message)
-        time.sleep(RETRY_TIME)
+            report_error(bot, error, recent_errors)
+            failures += 1
+        time.sleep(get_retry_time(failures))
 
 
 if __name__ == '__main__':
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - модуль: %(module)s - функция: '
-        '%(funcName)s - номер строки: %(lineno)d - %(message)s'
-    )
-    handler = StreamHandler(sys.stdout)
-    logger.setLevel(logging.INFO)
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    main()
+    listener = configure_logging()
+    try:
+        main()
+    finally:
+        if listener:
+            listener.stop()
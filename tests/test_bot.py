@@ -1,9 +1,17 @@
+import json
 import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
+import pytest
 import requests
 import telegram
 import utils
+from cachetools import TTLCache
+from exceptions import EndpointError
+from urllib3.response import HTTPResponse
 
 
 class MockResponseGET:
@@ -44,6 +52,11 @@ class MockResponseGET:
         )
         self.random_timestamp = random_timestamp
         self.status_code = http_status
+        self.headers = {}
+
+    @property
+    def content(self):
+        return json.dumps(self.json()).encode()
 
     def json(self):
         data = {
@@ -102,6 +115,12 @@ class TestHomework:
         for v in ENV_VARS:
             os.environ[v] = ''
 
+    @pytest.fixture(autouse=True)
+    def reset_conditional_headers(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'CONDITIONAL_HEADERS', {})
+
     def test_check_tokens_false(self):
         for v in self.ENV_VARS:
             try:
@@ -186,10 +205,10 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'get_api_answer'
         utils.check_function(homework, func_name, 1)
 
@@ -232,10 +251,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_500_response_get)
+
         func_name = 'get_api_answer'
         try:
             homework.get_api_answer(current_timestamp)
@@ -247,6 +266,125 @@ class TestHomework:
                 'когда API возвращает код, отличный от 200'
             )
 
+    def test_get_304_api_answer(self, monkeypatch, random_timestamp,
+                                current_timestamp, api_url):
+        def mock_304_response_get(*args, **kwargs):
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp,
+                http_status=HTTPStatus.NOT_MODIFIED, **kwargs
+            )
+
+            def json_empty_body():
+                raise ValueError('Ответ 304 не содержит тела')
+
+            response.json = json_empty_body
+            return response
+
+        import homework
+
+        monkeypatch.setattr(homework.SESSION, 'get', mock_304_response_get)
+
+        func_name = 'get_api_answer'
+        result = homework.get_api_answer(current_timestamp)
+        assert result == {
+            'homeworks': [],
+            'current_date': current_timestamp
+        }, (
+            f'Проверьте, что функция `{func_name}` при ответе API 304 '
+            'возвращает пустой список домашних работ и прежнюю метку времени'
+        )
+
+    def test_get_api_answer_conditional_headers(self, monkeypatch,
+                                                random_timestamp,
+                                                current_timestamp, api_url):
+        request_headers = []
+        validators = {
+            'ETag': '"abc123"',
+            'Last-Modified': 'Tue, 01 Mar 2022 00:00:00 GMT',
+        }
+
+        def mock_response_get(*args, **kwargs):
+            request_headers.append(kwargs['headers'])
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+            response.headers = validators
+            return response
+
+        import homework
+
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
+        func_name = 'get_api_answer'
+        homework.get_api_answer(current_timestamp)
+        homework.get_api_answer(current_timestamp)
+        assert 'If-None-Match' not in request_headers[0], (
+            f'Проверьте, что первый запрос функции `{func_name}` '
+            'не содержит условных заголовков'
+        )
+        assert request_headers[1].get('If-None-Match') == validators['ETag'], (
+            f'Проверьте, что функция `{func_name}` передаёт ETag '
+            'предыдущего ответа в заголовке If-None-Match'
+        )
+        assert (
+            request_headers[1].get('If-Modified-Since')
+            == validators['Last-Modified']
+        ), (
+            f'Проверьте, что функция `{func_name}` передаёт Last-Modified '
+            'предыдущего ответа в заголовке If-Modified-Since'
+        )
+        assert request_headers[1]['Authorization'].startswith('OAuth '), (
+            f'Проверьте, что функция `{func_name}` сохраняет заголовок '
+            'Authorization в условном запросе'
+        )
+
+    def test_process_updates_after_failed_iteration(self, monkeypatch,
+                                                    tmp_path,
+                                                    random_timestamp,
+                                                    current_timestamp):
+        def mock_response_get(*args, **kwargs):
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+            if 'If-None-Match' in kwargs['headers']:
+                response.status_code = HTTPStatus.NOT_MODIFIED
+            response.headers = {'ETag': '"abc123"'}
+            response.json = lambda: {
+                'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+                'current_date': random_timestamp
+            }
+            return response
+
+        send_attempts = []
+
+        def mock_send(chat_id=None, text=None, **kwargs):
+            send_attempts.append(text)
+            if len(send_attempts) == 1:
+                raise telegram.error.NetworkError('Telegram недоступен')
+
+        import homework
+
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+        monkeypatch.setattr(homework, 'STATUS_CACHE_PATH',
+                            str(tmp_path / 'homework_bot.json'))
+        bot = MockTelegramBot(token='1234:abcdefg')
+        monkeypatch.setattr(bot, 'send_message', mock_send)
+
+        func_name = 'process_updates'
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                homework.process_updates(bot, executor, current_timestamp, {})
+            except telegram.TelegramError:
+                pass
+            homework.process_updates(bot, executor, current_timestamp, {})
+        assert len(send_attempts) == 2, (
+            f'Убедитесь, что после сбоя функция `{func_name}` не отправляет '
+            'условный запрос и не теряет обновления из-за ответа 304'
+        )
+
     def test_parse_status(self, random_timestamp):
         test_data = {
             "id": 123,
@@ -315,10 +453,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         status = homework.check_response(response)
@@ -352,10 +490,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -400,10 +538,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -448,10 +586,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -484,10 +622,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_no_homeworks_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
@@ -525,10 +663,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -565,10 +703,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -599,10 +737,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_empty_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
@@ -626,10 +764,10 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         try:
             homework.get_api_answer(current_timestamp)
@@ -640,3 +778,310 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+    def test_report_error_sends_repeated_failure_once(self, monkeypatch,
+                                                      current_timestamp):
+        def mock_refused_get(*args, **kwargs):
+            raise requests.ConnectionError(
+                f'Connection refused: {object()}'
+            )
+
+        import homework
+
+        monkeypatch.setattr(homework.SESSION, 'get', mock_refused_get)
+        bot = MockTelegramBot(token='1234:abcdefg')
+        sent_messages = []
+        monkeypatch.setattr(
+            bot, 'send_message',
+            lambda chat_id, text: sent_messages.append(text)
+        )
+        recent_errors = TTLCache(maxsize=32, ttl=3600)
+
+        func_name = 'report_error'
+        for _ in range(2):
+            try:
+                homework.get_api_answer(current_timestamp)
+            except Exception as error:
+                homework.report_error(bot, error, recent_errors)
+        assert len(sent_messages) == 1, (
+            f'Убедитесь, что функция `{func_name}` не отправляет в Telegram '
+            'повторное сообщение об одном и том же сбое'
+        )
+
+    def test_report_error_survives_telegram_failure(self, monkeypatch):
+        def mock_failed_send(chat_id=None, text=None, **kwargs):
+            raise telegram.error.NetworkError('Telegram недоступен')
+
+        import homework
+
+        bot = MockTelegramBot(token='1234:abcdefg')
+        monkeypatch.setattr(bot, 'send_message', mock_failed_send)
+
+        func_name = 'report_error'
+        try:
+            homework.report_error(bot, EndpointError('Сбой'), {})
+        except telegram.TelegramError:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` логирует сбой '
+                'отправки сообщения в Telegram и не прерывает работу бота'
+            )
+
+    def test_get_status_updates(self):
+        import homework
+
+        func_name = 'get_status_updates'
+        utils.check_function(homework, func_name, 2)
+        homeworks = [
+            {
+                'homework_name': 'hw1', 'status': 'approved',
+                'date_updated': '2022-03-01T10:00:00Z'
+            },
+            {
+                'homework_name': 'hw2', 'status': 'rejected',
+                'date_updated': '2022-03-02T10:00:00Z'
+            },
+            {'homework_name': 'hw3', 'status': 'reviewing'},
+        ]
+        sent_updates = {
+            'hw1': '2022-03-01T10:00:00Z',
+            'hw2': '2022-03-01T12:00:00Z',
+            'hw3': None,
+        }
+        updates = homework.get_status_updates(homeworks, sent_updates)
+        assert [name for name, _, _ in updates] == ['hw2', 'hw3'], (
+            f'Проверьте, что функция `{func_name}` пропускает только работы '
+            'с уже отправленной датой изменения'
+        )
+        homework_name, date_updated, message = updates[0]
+        assert date_updated == '2022-03-02T10:00:00Z', (
+            f'Проверьте, что функция `{func_name}` возвращает новую дату '
+            'изменения работы'
+        )
+        assert message == homework.parse_status(homeworks[1]), (
+            f'Проверьте, что функция `{func_name}` возвращает сообщение '
+            'об изменении статуса работы'
+        )
+
+    def test_get_status_updates_invalid_homework(self):
+        import homework
+
+        func_name = 'get_status_updates'
+        for invalid_homework in ({'status': 'approved'}, 'hw1'):
+            try:
+                homework.parse_status(invalid_homework)
+            except (KeyError, TypeError) as error:
+                expected_error = error
+            try:
+                homework.get_status_updates([invalid_homework], {})
+            except (KeyError, TypeError) as error:
+                assert str(error) == str(expected_error), (
+                    f'Убедитесь, что функция `{func_name}` проверяет работы '
+                    'через parse_status до сравнения статусов'
+                )
+            else:
+                assert False, (
+                    f'Убедитесь, что функция `{func_name}` выбрасывает ошибку '
+                    'при некорректной информации о работе'
+                )
+
+    def test_sent_updates_cache(self, monkeypatch, tmp_path):
+        import homework
+
+        cache_path = tmp_path / 'cache' / 'homework_bot.json'
+        monkeypatch.setattr(homework, 'STATUS_CACHE_PATH', str(cache_path))
+        assert homework.load_sent_updates() == {}, (
+            'Убедитесь, что при отсутствии файла кэша `load_sent_updates` '
+            'возвращает пустой словарь'
+        )
+        sent_updates = {'hw1': '2022-03-01T10:00:00Z'}
+        homework.save_sent_updates(sent_updates)
+        assert homework.load_sent_updates() == sent_updates, (
+            'Убедитесь, что `load_sent_updates` загружает данные, '
+            'сохранённые `save_sent_updates`'
+        )
+        assert [path.name for path in cache_path.parent.iterdir()] == [
+            cache_path.name
+        ], (
+            'Убедитесь, что `save_sent_updates` не оставляет временных файлов'
+        )
+        for content in (b'[]', b'not json'):
+            cache_path.write_bytes(content)
+            assert homework.load_sent_updates() == {}, (
+                'Убедитесь, что при некорректном файле кэша '
+                '`load_sent_updates` возвращает пустой словарь'
+            )
+
+    def test_get_retry_time(self, monkeypatch):
+        import homework
+
+        func_name = 'get_retry_time'
+        utils.check_function(homework, func_name, 1)
+        monkeypatch.setattr(homework.random, 'uniform', lambda a, b: 0)
+        assert homework.get_retry_time(0) == homework.RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` после успешного запроса '
+            'возвращает RETRY_TIME'
+        )
+        retry_times = [homework.get_retry_time(n) for n in range(1, 5)]
+        assert retry_times[0] == homework.ERROR_RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` после первого сбоя '
+            'возвращает ERROR_RETRY_TIME'
+        )
+        assert retry_times == [
+            homework.ERROR_RETRY_TIME * 2 ** n for n in range(4)
+        ], (
+            f'Проверьте, что функция `{func_name}` удваивает паузу '
+            'после каждого следующего сбоя'
+        )
+        assert homework.get_retry_time(100) == homework.MAX_RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` ограничивает паузу '
+            'значением MAX_RETRY_TIME'
+        )
+
+    def test_retry_after_is_capped(self):
+        import homework
+
+        retry = homework.RETRY_STRATEGY.new()
+        long_wait = HTTPResponse(headers={'Retry-After': '7200'})
+        assert retry.get_retry_after(long_wait) == homework.MAX_RETRY_AFTER, (
+            'Убедитесь, что пауза по заголовку Retry-After ограничена '
+            'значением MAX_RETRY_AFTER'
+        )
+        short_wait = HTTPResponse(headers={'Retry-After': '5'})
+        assert retry.get_retry_after(short_wait) == 5, (
+            'Убедитесь, что короткая пауза по заголовку Retry-After '
+            'соблюдается'
+        )
+
+    def test_report_error_sends_different_failures(self, monkeypatch):
+        import homework
+
+        bot = MockTelegramBot(token='1234:abcdefg')
+        sent_messages = []
+        monkeypatch.setattr(
+            bot, 'send_message',
+            lambda chat_id, text: sent_messages.append(text)
+        )
+        recent_errors = TTLCache(maxsize=32, ttl=3600)
+
+        func_name = 'report_error'
+        for response, homework_info in (
+            ({'homeworks': []}, None),
+            (None, {'status': 'approved'}),
+            (None, {'homework_name': 'hw1', 'status': 'unknown'}),
+            (None, {'homework_name': 'hw1', 'status': 'other'}),
+        ):
+            try:
+                if response is not None:
+                    homework.check_response(response)
+                else:
+                    homework.parse_status(homework_info)
+            except Exception as error:
+                homework.report_error(bot, error, recent_errors)
+        assert len(sent_messages) == 4, (
+            f'Убедитесь, что функция `{func_name}` отправляет в Telegram '
+            'сообщения о разных сбоях'
+        )
+
+    def test_report_error_retries_failed_send(self, monkeypatch):
+        send_attempts = []
+
+        def mock_failed_send(chat_id=None, text=None, **kwargs):
+            send_attempts.append(text)
+            raise telegram.error.NetworkError('Telegram недоступен')
+
+        import homework
+
+        bot = MockTelegramBot(token='1234:abcdefg')
+        monkeypatch.setattr(bot, 'send_message', mock_failed_send)
+        recent_errors = TTLCache(maxsize=32, ttl=3600)
+
+        func_name = 'report_error'
+        for _ in range(2):
+            homework.report_error(bot, EndpointError('Сбой'), recent_errors)
+        assert len(send_attempts) == 2, (
+            f'Убедитесь, что функция `{func_name}` не считает сбой '
+            'отправленным, если сообщение о нём не дошло до Telegram'
+        )
+
+    def test_telegram_imported_lazily(self):
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import sys, homework; print("telegram" in sys.modules)'
+            ],
+            cwd=root_dir, capture_output=True, text=True
+        )
+        assert result.stdout.strip() == 'False', (
+            'Убедитесь, что импорт модуля homework не загружает telegram'
+        )
+
+    def test_configure_logging_is_idempotent(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework.logger, 'handlers', [])
+        monkeypatch.setattr(homework.logger, 'level', homework.logger.level)
+        func_name = 'configure_logging'
+        utils.check_function(homework, func_name, 0)
+        listener = homework.configure_logging()
+        try:
+            assert homework.configure_logging() is None, (
+                f'Убедитесь, что повторный вызов `{func_name}` '
+                'не запускает ещё один обработчик логов'
+            )
+            assert len(homework.logger.handlers) == 1, (
+                f'Убедитесь, что повторный вызов `{func_name}` '
+                'не добавляет обработчики логгеру'
+            )
+        finally:
+            listener.stop()
+
+    def test_send_updates_keeps_delivered_on_failure(self, monkeypatch,
+                                                     tmp_path):
+        sent_messages = []
+
+        def mock_send(chat_id=None, text=None, **kwargs):
+            if '"hw2"' in text:
+                raise telegram.error.NetworkError('Telegram недоступен')
+            sent_messages.append(text)
+
+        import homework
+
+        cache_path = tmp_path / 'homework_bot.json'
+        monkeypatch.setattr(homework, 'STATUS_CACHE_PATH', str(cache_path))
+        monkeypatch.setattr(homework, 'CHAT_SEND_INTERVAL', 0.05)
+        bot = MockTelegramBot(token='1234:abcdefg')
+        monkeypatch.setattr(bot, 'send_message', mock_send)
+        updates = [
+            (f'hw{index}', f'2022-03-0{index}T10:00:00Z', f'"hw{index}"')
+            for index in range(1, 5)
+        ]
+        sent_updates = {}
+
+        func_name = 'send_updates'
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            try:
+                homework.send_updates(executor, bot, updates, sent_updates)
+            except telegram.TelegramError:
+                pass
+            else:
+                assert False, (
+                    f'Убедитесь, что функция `{func_name}` пробрасывает '
+                    'ошибку отправки сообщения'
+                )
+        assert sent_messages == ['"hw1"', '"hw3"', '"hw4"'], (
+            f'Убедитесь, что функция `{func_name}` отправляет сообщения '
+            'по порядку и не прерывает отправку остальных при сбое'
+        )
+        expected_updates = {
+            name: date_updated for name, date_updated, _ in updates
+            if name != 'hw2'
+        }
+        assert sent_updates == expected_updates, (
+            f'Убедитесь, что функция `{func_name}` запоминает только '
+            'доставленные обновления'
+        )
+        assert homework.load_sent_updates() == expected_updates, (
+            f'Убедитесь, что функция `{func_name}` сохраняет доставленные '
+            'обновления в кэш даже при сбое отправки'
+        )